@@ -0,0 +1,12 @@
+from pathlib import Path
+
+from _plot_core import render_all
+
+BASE_DIR = Path(__file__).resolve().parents[1]
+
+# render_all spawns worker processes; the guard keeps workers that
+# re-import this module (spawn/forkserver start methods) from recursing.
+if __name__ == "__main__":
+    render_all(BASE_DIR / "benchmark_results" / "html_reports",
+               BASE_DIR / "benchmark_results" / "plots",
+               inject_html=True)